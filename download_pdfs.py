@@ -4,24 +4,34 @@ Script Automatizado para Download de PDFs de Gramática
 """
 
 import os
-import requests
-import time
+import asyncio
 from urllib.parse import urljoin, urlparse
 import logging
 
+import httpx
+
 # Configuração de logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Tamanho dos blocos gravados em disco durante o download
+CHUNK_SIZE = 64 * 1024
+
+# Política de novas tentativas para falhas transitórias do servidor
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
 class PDFDownloader:
     """Classe para download automatizado de PDFs de gramática"""
     
-    def __init__(self, download_dir="./grammar_pdfs"):
+    def __init__(self, download_dir="./grammar_pdfs", max_concurrency=8):
         self.download_dir = download_dir
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
+        }
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
         
         # Cria diretórios se não existirem
         os.makedirs(download_dir, exist_ok=True)
@@ -30,7 +40,7 @@ class PDFDownloader:
         os.makedirs(os.path.join(download_dir, "classicos"), exist_ok=True)
         os.makedirs(os.path.join(download_dir, "especializados"), exist_ok=True)
     
-    def download_file(self, url, filename, subfolder=""):
+    async def download_file(self, client, url, filename, subfolder=""):
         """Download de um arquivo PDF"""
         try:
             full_path = os.path.join(self.download_dir, subfolder, filename)
@@ -40,35 +50,61 @@ class PDFDownloader:
                 logger.info(f"Arquivo já existe: {filename}")
                 return True
             
-            logger.info(f"Baixando: {filename}")
-            
-            response = self.session.get(url, timeout=30)
-            response.raise_for_status()
-            
-            # Verifica se é realmente um PDF
-            if 'application/pdf' not in response.headers.get('content-type', ''):
-                logger.warning(f"Arquivo pode não ser PDF: {filename}")
-            
-            with open(full_path, 'wb') as f:
-                f.write(response.content)
+            # Limita o número de downloads simultâneos
+            async with self._semaphore:
+                logger.info(f"Baixando: {filename}")
+                
+                partial_path = full_path + ".part"
+                for attempt in range(MAX_RETRIES + 1):
+                    async with client.stream("GET", url) as response:
+                        if response.status_code in RETRY_STATUSES and attempt < MAX_RETRIES:
+                            delay = BACKOFF_FACTOR * (2 ** attempt)
+                            logger.warning(f"HTTP {response.status_code} em {filename}, nova tentativa em {delay:.1f}s")
+                            await asyncio.sleep(delay)
+                            continue
+                        
+                        response.raise_for_status()
+                        
+                        # Verifica se é realmente um PDF
+                        if 'application/pdf' not in response.headers.get('content-type', ''):
+                            logger.warning(f"Arquivo pode não ser PDF: {filename}")
+                        
+                        # Grava em disco à medida que os dados chegam
+                        with open(partial_path, 'wb') as f:
+                            async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                                f.write(chunk)
+                        break
+                
+                os.replace(partial_path, full_path)
             
             logger.info(f"✅ Baixado com sucesso: {filename}")
-            time.sleep(1)  # Pausa respeitosa entre downloads
             return True
             
         except Exception as e:
             logger.error(f"❌ Erro ao baixar {filename}: {e}")
+            # Remove download incompleto para não ser tratado como existente
+            partial_path = os.path.join(self.download_dir, subfolder, filename + ".part")
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
             return False
     
-    def download_presidencia_manual(self):
+    async def _download_many(self, client, items, subfolder):
+        """Baixa uma lista de arquivos concorrentemente"""
+        results = await asyncio.gather(
+            *(self.download_file(client, item["url"], item["filename"], subfolder) for item in items),
+            return_exceptions=True
+        )
+        return sum(1 for result in results if result is True)
+    
+    async def download_presidencia_manual(self, client):
         """Download do Manual de Redação da Presidência"""
         logger.info("📋 Baixando Manual de Redação da Presidência...")
         
         # URL direta para o manual (verificar se ainda está ativa)
         url = "https://www4.planalto.gov.br/centrodeestudos/assuntos/manual-de-redacao-da-presidencia-da-republica/manual-de-redacao.pdf"
-        return self.download_file(url, "manual_redacao_presidencia.pdf", "governamentais")
+        return await self.download_file(client, url, "manual_redacao_presidencia.pdf", "governamentais")
     
-    def download_abl_materials(self):
+    async def download_abl_materials(self, client):
         """Download de materiais da Academia Brasileira de Letras"""
         logger.info("🎓 Baixando materiais da ABL...")
         
@@ -80,14 +116,10 @@ class PDFDownloader:
             }
         ]
         
-        success_count = 0
-        for material in materials:
-            if self.download_file(material["url"], material["filename"], "governamentais"):
-                success_count += 1
-        
+        success_count = await self._download_many(client, materials, "governamentais")
         return success_count > 0
     
-    def download_public_domain_books(self):
+    async def download_public_domain_books(self, client):
         """Download de livros de domínio público"""
         logger.info("📚 Baixando livros clássicos de domínio público...")
         
@@ -103,14 +135,10 @@ class PDFDownloader:
             }
         ]
         
-        success_count = 0
-        for book in books:
-            if self.download_file(book["url"], book["filename"], "classicos"):
-                success_count += 1
-        
+        success_count = await self._download_many(client, books, "classicos")
         return success_count > 0
     
-    def download_university_materials(self):
+    async def download_university_materials(self, client):
         """Download de materiais universitários públicos"""
         logger.info("🏛️ Baixando materiais universitários...")
         
@@ -122,11 +150,7 @@ class PDFDownloader:
             }
         ]
         
-        success_count = 0
-        for material in materials:
-            if self.download_file(material["url"], material["filename"], "academicos"):
-                success_count += 1
-        
+        success_count = await self._download_many(client, materials, "academicos")
         return success_count > 0
     
     def create_sample_materials(self):
@@ -326,36 +350,39 @@ TODAS são acentuadas:
         logger.info(f"✅ Arquivo de exemplo criado: {sample_file}")
         return True
     
-    def download_all(self):
+    async def download_all(self):
         """Executa todos os downloads"""
         logger.info("🚀 Iniciando download de materiais de gramática...")
         
         downloads_successful = []
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
         
-        # Tenta baixar cada categoria
-        try:
-            if self.download_presidencia_manual():
-                downloads_successful.append("Manual da Presidência")
-        except Exception as e:
-            logger.error(f"Erro no download da Presidência: {e}")
-        
-        try:
-            if self.download_abl_materials():
-                downloads_successful.append("Materiais ABL")
-        except Exception as e:
-            logger.error(f"Erro no download da ABL: {e}")
+        categories = [
+            ("Manual da Presidência", "da Presidência", self.download_presidencia_manual),
+            ("Materiais ABL", "da ABL", self.download_abl_materials),
+            ("Livros clássicos", "de livros clássicos", self.download_public_domain_books),
+            ("Materiais universitários", "universitário", self.download_university_materials),
+        ]
         
-        try:
-            if self.download_public_domain_books():
-                downloads_successful.append("Livros clássicos")
-        except Exception as e:
-            logger.error(f"Erro no download de livros clássicos: {e}")
+        # Baixa todas as categorias concorrentemente, reutilizando as conexões
+        limits = httpx.Limits(
+            max_connections=2 * self.max_concurrency,
+            max_keepalive_connections=2 * self.max_concurrency
+        )
+        transport = httpx.AsyncHTTPTransport(limits=limits, retries=MAX_RETRIES)
+        async with httpx.AsyncClient(
+            timeout=30, headers=self.headers, follow_redirects=True, transport=transport
+        ) as client:
+            results = await asyncio.gather(
+                *(download(client) for _, _, download in categories),
+                return_exceptions=True
+            )
         
-        try:
-            if self.download_university_materials():
-                downloads_successful.append("Materiais universitários")
-        except Exception as e:
-            logger.error(f"Erro no download universitário: {e}")
+        for (category, label, _), result in zip(categories, results):
+            if isinstance(result, Exception):
+                logger.error(f"Erro no download {label}: {result}")
+            elif result:
+                downloads_successful.append(category)
         
         # Sempre cria materiais de exemplo
         if self.create_sample_materials():
@@ -375,12 +402,20 @@ TODAS são acentuadas:
         """Lista todos os arquivos baixados"""
         logger.info("📋 Arquivos disponíveis para treinamento:")
         
-        for root, dirs, files in os.walk(self.download_dir):
-            for file in files:
-                if file.endswith(('.pdf', '.txt')):
-                    rel_path = os.path.relpath(os.path.join(root, file), self.download_dir)
-                    file_size = os.path.getsize(os.path.join(root, file))
-                    logger.info(f"   📄 {rel_path} ({file_size:,} bytes)")
+        for entry in self._walk_scandir(self.download_dir):
+            if entry.name.endswith(('.pdf', '.txt')):
+                rel_path = os.path.relpath(entry.path, self.download_dir)
+                file_size = entry.stat().st_size
+                logger.info(f"   📄 {rel_path} ({file_size:,} bytes)")
+    
+    def _walk_scandir(self, path):
+        """Percorre recursivamente os arquivos usando os.scandir"""
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    yield from self._walk_scandir(entry.path)
+                elif entry.is_file():
+                    yield entry
 
 def main():
     """Função principal"""
@@ -390,7 +425,7 @@ def main():
     downloader = PDFDownloader()
     
     try:
-        success = downloader.download_all()
+        success = asyncio.run(downloader.download_all())
         
         if success:
             print("\n🎉 Download concluído com sucesso!")
@@ -108,16 +108,20 @@ wait_for_service() {
     
     log_info "Waiting for ${service_name} to be healthy..."
     
-    local counter=0
-    while [ $counter -lt $timeout ]; do
-        if curl -s -f "${health_url}" > /dev/null 2>&1; then
+    # Probe with exponential backoff (0.1s doubling up to 2s, ±20% jitter)
+    # until the service answers or the time budget runs out
+    local start=$SECONDS
+    local delay_ms=100
+    while [ $((SECONDS - start)) -lt $timeout ]; do
+        if curl -s -f --max-time 5 "${health_url}" > /dev/null 2>&1; then
             log_success "${service_name} is healthy"
             return 0
         fi
         
         echo -n "."
-        sleep 2
-        counter=$((counter + 2))
+        local sleep_ms=$((delay_ms * (80 + RANDOM % 41) / 100))
+        sleep "$((sleep_ms / 1000)).$(printf '%03d' $((sleep_ms % 1000)))"
+        delay_ms=$((delay_ms * 2 > 2000 ? 2000 : delay_ms * 2))
     done
     
     log_error "${service_name} failed to become healthy within ${timeout}s"
@@ -208,7 +212,6 @@ main() {
             cleanup_existing
             build_services
             deploy_services
-            sleep 10  # Give services time to start
             check_health
             run_tests
             show_status
@@ -19,6 +19,9 @@ GRAFANA="http://localhost:3000/api/health"
 LANGUAGETOOL="http://localhost:8010/v2/check?text=test"
 SPACY="http://localhost:8020/health"
 
+# Scratch space for probes that run in the background
+PROBE_DIR=$(mktemp -d)
+
 # Functions
 check_service() {
     local name=$1
@@ -93,12 +96,21 @@ check_services() {
     echo "====================="
     
     local all_healthy=true
+    local names=("API Gateway" "Prometheus" "Grafana" "LanguageTool" "SpaCy")
+    local urls=("$API_GATEWAY" "$PROMETHEUS" "$GRAFANA" "$LANGUAGETOOL" "$SPACY")
+    local timeouts=(10 10 10 15 10)
+    local pids=()
+    local i
     
-    check_service "API Gateway" "$API_GATEWAY" || all_healthy=false
-    check_service "Prometheus" "$PROMETHEUS" || all_healthy=false
-    check_service "Grafana" "$GRAFANA" || all_healthy=false
-    check_service "LanguageTool" "$LANGUAGETOOL" 15 || all_healthy=false
-    check_service "SpaCy" "$SPACY" || all_healthy=false
+    # Probe all services concurrently, buffering each report so they print in order
+    for i in "${!names[@]}"; do
+        check_service "${names[$i]}" "${urls[$i]}" "${timeouts[$i]}" > "$PROBE_DIR/service_$i.out" &
+        pids[$i]=$!
+    done
+    for i in "${!names[@]}"; do
+        wait "${pids[$i]}" || all_healthy=false
+        cat "$PROBE_DIR/service_$i.out"
+    done
     
     echo ""
     return $all_healthy
@@ -130,23 +142,35 @@ check_system_resources() {
     echo ""
 }
 
+# Format curl's time_total (seconds) as milliseconds
+format_latency() {
+    awk -v seconds="$1" 'BEGIN { printf "%.1fms", seconds * 1000 }'
+}
+
 test_api_functionality() {
     echo -e "${BLUE}API Functionality Tests:${NC}"
     echo "======================="
     
-    # Test correction endpoint
-    echo -n "Testing correction endpoint... "
-    local response=$(curl -s -w "%{http_code}" -o /tmp/correction_test.json \
+    # Run all probes concurrently, then report them in order
+    curl -s -w "%{http_code} %{time_total}\n" -o "$PROBE_DIR/correction_test.json" \
         -X POST "http://localhost:8000/correct" \
         -H "Content-Type: application/json" \
-        -d '{"text": "eu gosta de programar"}' 2>/dev/null)
+        -d '{"text": "eu gosta de programar"}' > "$PROBE_DIR/correct.status" 2>/dev/null &
+    curl -s -w "%{http_code} %{time_total}\n" -o /dev/null "http://localhost:8000/health" > "$PROBE_DIR/health.status" 2>/dev/null &
+    curl -s -w "%{http_code} %{time_total}\n" -o /dev/null "http://localhost:8000/metrics" > "$PROBE_DIR/metrics.status" 2>/dev/null &
+    wait
+    
+    # Test correction endpoint
+    echo -n "Testing correction endpoint... "
+    local response latency
+    read -r response latency < "$PROBE_DIR/correct.status"
     
     if [ "$response" = "200" ]; then
-        echo -e "${GREEN}✓${NC}"
+        echo -e "${GREEN}✓${NC} ($(format_latency "$latency"))"
         # Show correction result
         if command -v jq &> /dev/null; then
-            local original=$(jq -r '.original_text' /tmp/correction_test.json 2>/dev/null)
-            local corrected=$(jq -r '.corrected_text' /tmp/correction_test.json 2>/dev/null)
+            local original=$(jq -r '.original_text' "$PROBE_DIR/correction_test.json" 2>/dev/null)
+            local corrected=$(jq -r '.corrected_text' "$PROBE_DIR/correction_test.json" 2>/dev/null)
             echo "  Original: $original"
             echo "  Corrected: $corrected"
         fi
@@ -156,18 +180,20 @@ test_api_functionality() {
     
     # Test health endpoint
     echo -n "Testing health endpoint... "
-    local health_response=$(curl -s -w "%{http_code}" -o /dev/null "http://localhost:8000/health" 2>/dev/null)
+    local health_response health_latency
+    read -r health_response health_latency < "$PROBE_DIR/health.status"
     if [ "$health_response" = "200" ]; then
-        echo -e "${GREEN}✓${NC}"
+        echo -e "${GREEN}✓${NC} ($(format_latency "$health_latency"))"
     else
         echo -e "${RED}✗ (HTTP $health_response)${NC}"
     fi
     
     # Test metrics endpoint
     echo -n "Testing metrics endpoint... "
-    local metrics_response=$(curl -s -w "%{http_code}" -o /dev/null "http://localhost:8000/metrics" 2>/dev/null)
+    local metrics_response metrics_latency
+    read -r metrics_response metrics_latency < "$PROBE_DIR/metrics.status"
     if [ "$metrics_response" = "200" ]; then
-        echo -e "${GREEN}✓${NC}"
+        echo -e "${GREEN}✓${NC} ($(format_latency "$metrics_latency"))"
     else
         echo -e "${RED}✗ (HTTP $metrics_response)${NC}"
     fi
@@ -226,6 +252,6 @@ main() {
 }
 
 # Clean up temporary files on exit
-trap 'rm -f /tmp/correction_test.json' EXIT
+trap 'rm -rf "$PROBE_DIR"' EXIT
 
 main "$@"
@@ -6,22 +6,22 @@ Orchestrates requests between LanguageTool and SpaCy services
 
 import os
 import asyncio
+import hashlib
 import time
-from typing import List, Dict, Optional, Any
+from typing import Annotated, List, Dict, Optional, Any
 from datetime import datetime, timedelta
 
-import httpx
+import aiohttp
+import orjson
 import structlog
-from fastapi import FastAPI, HTTPException, Request, Depends
+from fastapi import FastAPI, HTTPException, Request, Depends, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, Field
-from prometheus_client import Counter, Histogram, generate_latest
-from slowapi import Limiter, _rate_limit_exceeded_handler
+from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
 from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
-from slowapi.middleware import SlowAPIMiddleware
-import redis
+from redis import asyncio as aioredis
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 # Configure structured logging
@@ -46,17 +46,81 @@ structlog.configure(
 logger = structlog.get_logger()
 
 # Prometheus metrics
+# Latency buckets concentrated on the tens-to-hundreds of milliseconds these services take,
+# reaching past the 5s and 10s p95 alert thresholds
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.2, 0.4, 0.8, 1.6, 3.2, 6.4, 12.8)
 REQUEST_COUNT = Counter('gateway_requests_total', 'Total requests to gateway', ['method', 'endpoint', 'status'])
-REQUEST_DURATION = Histogram('gateway_request_duration_seconds', 'Request duration in seconds')
+REQUEST_DURATION = Histogram('gateway_request_duration_seconds', 'Request duration in seconds', buckets=LATENCY_BUCKETS)
 LANGUAGETOOL_REQUESTS = Counter('languagetool_requests_total', 'Requests to LanguageTool', ['status'])
 SPACY_REQUESTS = Counter('spacy_requests_total', 'Requests to SpaCy', ['status'])
-CORRECTION_DURATION = Histogram('correction_duration_seconds', 'Time to complete correction')
+CORRECTION_DURATION = Histogram('correction_duration_seconds', 'Time to complete correction', buckets=LATENCY_BUCKETS)
+RATE_LIMIT_HITS = Counter('api_gateway_rate_limit_hits_total', 'Requests rejected by the rate limiter')
 
-# Initialize rate limiter
-limiter = Limiter(key_func=get_remote_address)
+# LanguageTool doesn't provide per-match confidence, so every match gets this score
+LANGUAGETOOL_CONFIDENCE = 1.0
 
-# Initialize Redis for caching (optional)
+# The SpaCy service rejects longer texts, so they are corrected without its analysis
+SPACY_MAX_TEXT_LENGTH = 10000
+
+# LanguageTool calls one batch may have in flight, well below the connector's
+# limit_per_host so a large batch can't take every connection from other requests
+LANGUAGETOOL_BATCH_CONCURRENCY = 16
+
+# Rate limit: RATE_LIMIT_REQUESTS per RATE_LIMIT_WINDOW seconds per client
+RATE_LIMIT_REQUESTS = int(os.getenv('RATE_LIMIT_REQUESTS', 100))
+RATE_LIMIT_WINDOW = float(os.getenv('RATE_LIMIT_WINDOW', 60))
+
+# Refills the bucket from the elapsed Redis server time, then takes `cost` tokens
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1])
+local ts = tonumber(bucket[2])
+if tokens == nil or ts == nil then
+    tokens = capacity
+    ts = now
+end
+tokens = math.min(capacity, tokens + (now - ts) * rate / 1000)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return allowed
+"""
+
+class TokenBucketLimiter:
+    """Redis-backed token bucket shared by all gateway workers"""
+    
+    def __init__(self, client, capacity: int, window: float):
+        self.capacity = capacity
+        self.rate = capacity / window
+        self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+    
+    async def consume(self, key: str, cost: int = 1) -> bool:
+        """Take `cost` tokens from the bucket for `key`, returning whether allowed"""
+        allowed = await self._script(keys=[f"ratelimit:{key}"], args=[self.capacity, self.rate, cost])
+        return allowed == 1
+
+# Initialize Redis for caching and rate limiting (optional)
 redis_client = None
+rate_limiter = None
+
+# Timestamps are refreshed at most every half second and shared between responses
+_now_cache = [0.0, None]
+
+def now_cached() -> datetime:
+    """Return the current time, at most 0.5s stale"""
+    t = time.time()
+    if t - _now_cache[0] > 0.5:
+        _now_cache[:] = [t, datetime.fromtimestamp(t)]
+    return _now_cache[1]
 
 # Pydantic models
 class CorrectionRequest(BaseModel):
@@ -64,7 +128,29 @@ class CorrectionRequest(BaseModel):
     language: str = Field(default="pt-BR", description="Language code")
     enable_spacy: bool = Field(default=True, description="Enable SpaCy semantic analysis")
     include_suggestions: bool = Field(default=True, description="Include improvement suggestions")
-    threshold: float = Field(default=0.3, ge=0.0, le=1.0, description="Correction confidence threshold")
+    threshold: float = Field(default=0.3, ge=0.0, le=1.0, description="Accepted for compatibility; no longer affects which corrections are applied")
+
+class BatchCorrectionRequest(BaseModel):
+    texts: List[Annotated[str, Field(min_length=1, max_length=50000)]] = Field(
+        ..., min_length=1, max_length=100, description="Texts to correct"
+    )
+    language: str = Field(default="pt-BR", description="Language code")
+    enable_spacy: bool = Field(default=True, description="Enable SpaCy semantic analysis")
+    include_suggestions: bool = Field(default=True, description="Include improvement suggestions")
+    threshold: float = Field(default=0.3, ge=0.0, le=1.0, description="Accepted for compatibility; no longer affects which corrections are applied")
+    
+    def to_requests(self) -> List[CorrectionRequest]:
+        """Expand into one correction request per text"""
+        return [
+            CorrectionRequest(
+                text=text,
+                language=self.language,
+                enable_spacy=self.enable_spacy,
+                include_suggestions=self.include_suggestions,
+                threshold=self.threshold
+            )
+            for text in self.texts
+        ]
 
 class LanguageToolError(BaseModel):
     offset: int
@@ -108,26 +194,41 @@ class CorrectionOrchestrator:
         self.languagetool_url = os.getenv('LANGUAGETOOL_URL', 'http://languagetool:8010')
         self.spacy_url = os.getenv('SPACY_URL', 'http://spacy-enhancer:8020')
         self.start_time = time.time()
+        self._session: Optional[aiohttp.ClientSession] = None
+    
+    async def start(self):
+        """Create the pooled HTTP session shared by all requests"""
+        # Upstreams speak HTTP/1.1 only, so concurrency comes from a pool of
+        # keep-alive connections; idle ones close before SpaCy's 75s server timeout
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=200, limit_per_host=100, keepalive_timeout=30),
+            # sock_connect, not connect: waiting for a free pooled connection must fall
+            # under the total budget rather than fail the call after 2s
+            timeout=aiohttp.ClientTimeout(total=30, sock_connect=2)
+        )
+    
+    async def close(self):
+        """Close the pooled HTTP session"""
+        if self._session is not None:
+            await self._session.close()
         
     async def _call_languagetool(self, text: str, language: str = "pt-BR") -> Dict[str, Any]:
         """Call LanguageTool service for grammar checking"""
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{self.languagetool_url}/v2/check",
-                    data={
-                        "text": text,
-                        "language": language,
-                        "enabledOnly": "false"
-                    }
-                )
-                
-                if response.status_code == 200:
+            async with self._session.post(
+                f"{self.languagetool_url}/v2/check",
+                data={
+                    "text": text,
+                    "language": language,
+                    "enabledOnly": "false"
+                }
+            ) as response:
+                if response.status == 200:
                     LANGUAGETOOL_REQUESTS.labels(status="success").inc()
-                    return response.json()
+                    return await response.json()
                 else:
                     LANGUAGETOOL_REQUESTS.labels(status="error").inc()
-                    logger.error("LanguageTool error", status_code=response.status_code, response=response.text)
+                    logger.error("LanguageTool error", status_code=response.status, response=await response.text())
                     return {"matches": []}
                     
         except Exception as e:
@@ -138,24 +239,22 @@ class CorrectionOrchestrator:
     async def _call_spacy(self, text: str) -> Dict[str, Any]:
         """Call SpaCy service for semantic analysis"""
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{self.spacy_url}/analyze",
-                    json={
-                        "text": text,
-                        "include_entities": False,
-                        "include_pos": False,
-                        "include_dependencies": False,
-                        "include_suggestions": True
-                    }
-                )
-                
-                if response.status_code == 200:
+            async with self._session.post(
+                f"{self.spacy_url}/analyze",
+                json={
+                    "text": text,
+                    "include_entities": False,
+                    "include_pos": False,
+                    "include_dependencies": False,
+                    "include_suggestions": True
+                }
+            ) as response:
+                if response.status == 200:
                     SPACY_REQUESTS.labels(status="success").inc()
-                    return response.json()
+                    return await response.json()
                 else:
                     SPACY_REQUESTS.labels(status="error").inc()
-                    logger.error("SpaCy error", status_code=response.status_code, response=response.text)
+                    logger.error("SpaCy error", status_code=response.status, response=await response.text())
                     return {"suggestions": []}
                     
         except Exception as e:
@@ -163,124 +262,206 @@ class CorrectionOrchestrator:
             logger.error("SpaCy request failed", error=str(e))
             return {"suggestions": []}
     
-    def _apply_corrections(self, text: str, errors: List[Dict], threshold: float = 0.3) -> str:
+    async def _call_spacy_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Call SpaCy service for semantic analysis of several texts at once"""
+        try:
+            async with self._session.post(
+                f"{self.spacy_url}/analyze/batch",
+                json={
+                    "texts": texts,
+                    "include_entities": False,
+                    "include_pos": False,
+                    "include_dependencies": False,
+                    "include_suggestions": True
+                }
+            ) as response:
+                if response.status == 200:
+                    SPACY_REQUESTS.labels(status="success").inc()
+                    return await response.json()
+                else:
+                    SPACY_REQUESTS.labels(status="error").inc()
+                    logger.error("SpaCy batch error", status_code=response.status, response=await response.text())
+                    return [{"suggestions": []} for _ in texts]
+                    
+        except Exception as e:
+            SPACY_REQUESTS.labels(status="error").inc()
+            logger.error("SpaCy batch request failed", error=str(e))
+            return [{"suggestions": []} for _ in texts]
+    
+    def _apply_corrections(self, text: str, errors: List[Dict]) -> str:
         """Apply corrections to text based on LanguageTool suggestions"""
-        corrected_text = text
-        offset_adjustment = 0
+        parts = []
+        cursor = 0
         
-        # Sort errors by offset to apply corrections from left to right
-        sorted_errors = sorted(errors, key=lambda x: x.get('offset', 0))
-        
-        for error in sorted_errors:
+        # Walk errors left to right, copying the untouched text between them
+        for error in sorted(errors, key=lambda x: x.get('offset', 0)):
             if not error.get('replacements'):
                 continue
-                
-            # Get the best suggestion
-            best_replacement = error['replacements'][0]['value']
             
-            # Calculate confidence (simplified)
-            confidence = 1.0 - (error.get('offset', 0) / len(text))
+            start = error['offset']
+            if start < cursor:
+                # Overlaps a correction that was already applied
+                continue
             
-            if confidence >= threshold:
-                start = error['offset'] + offset_adjustment
-                end = start + error['length']
-                
-                # Apply correction
-                corrected_text = corrected_text[:start] + best_replacement + corrected_text[end:]
-                
-                # Adjust offset for subsequent corrections
-                offset_adjustment += len(best_replacement) - error['length']
+            # Use the best suggestion
+            parts.append(text[cursor:start])
+            parts.append(error['replacements'][0]['value'])
+            cursor = start + error['length']
         
-        return corrected_text
+        parts.append(text[cursor:])
+        return "".join(parts)
     
     async def correct_text(self, request: CorrectionRequest) -> CorrectionResponse:
         """Orchestrate text correction using both services"""
         start_time = time.time()
         
+        # Whitespace-only text has nothing to check
+        if request.text.isspace():
+            return self._build_response(request, {"matches": []}, {"suggestions": []}, start_time)
+        
         try:
             # Call LanguageTool and SpaCy concurrently
             tasks = [self._call_languagetool(request.text, request.language)]
             
-            if request.enable_spacy:
+            if request.enable_spacy and len(request.text) <= SPACY_MAX_TEXT_LENGTH:
                 tasks.append(self._call_spacy(request.text))
             
-            results = await asyncio.gather(*tasks)
+            results = await asyncio.gather(*tasks, return_exceptions=True)
             
-            languagetool_result = results[0]
-            spacy_result = results[1] if len(results) > 1 else {"suggestions": []}
+            # A failed call degrades to an empty result instead of failing the correction
+            languagetool_result = self._result_or_default(results[0], {"matches": []}, "languagetool")
+            spacy_result = {"suggestions": []}
+            if len(results) > 1:
+                spacy_result = self._result_or_default(results[1], spacy_result, "spacy")
             
-            # Process LanguageTool errors
-            lt_errors = []
-            for match in languagetool_result.get('matches', []):
-                lt_errors.append(LanguageToolError(
-                    offset=match.get('offset', 0),
-                    length=match.get('length', 0),
-                    rule_id=match.get('rule', {}).get('id', ''),
-                    message=match.get('message', ''),
-                    shortMessage=match.get('shortMessage', ''),
-                    suggestions=[rep['value'] for rep in match.get('replacements', [])[:3]],
-                    category=match.get('rule', {}).get('category', {}).get('name', ''),
-                    confidence=1.0  # LanguageTool doesn't provide confidence, so we use 1.0
-                ))
+            return self._build_response(request, languagetool_result, spacy_result, start_time)
             
-            # Process SpaCy suggestions
-            spacy_suggestions = []
-            for suggestion in spacy_result.get('suggestions', []):
-                spacy_suggestions.append(SpaCySuggestion(
-                    original=suggestion.get('original', ''),
-                    suggestion=suggestion.get('suggestion', ''),
-                    confidence=suggestion.get('confidence', 0.0),
-                    reason=suggestion.get('reason', ''),
-                    start=suggestion.get('start', 0),
-                    end=suggestion.get('end', 0)
-                ))
+        except Exception as e:
+            logger.error("Error in correction orchestration", error=str(e))
+            raise HTTPException(status_code=500, detail=f"Correction failed: {str(e)}")
+    
+    async def correct_batch(self, requests: List[CorrectionRequest]) -> List[CorrectionResponse]:
+        """Orchestrate correction of several texts, sending SpaCy a single batch"""
+        start_time = time.time()
+        
+        try:
+            # One LanguageTool call per text, all texts to SpaCy in one call;
+            # whitespace-only texts have nothing to check and skip both
+            checked_indices = [i for i, req in enumerate(requests) if not req.text.isspace()]
+            languagetool_slots = asyncio.Semaphore(LANGUAGETOOL_BATCH_CONCURRENCY)
             
-            # Apply corrections
-            corrected_text = self._apply_corrections(
-                request.text, 
-                languagetool_result.get('matches', []), 
-                request.threshold
-            )
+            async def check(req: CorrectionRequest) -> Dict[str, Any]:
+                async with languagetool_slots:
+                    return await self._call_languagetool(req.text, req.language)
             
-            # Calculate overall confidence score
-            total_errors = len(lt_errors)
-            confidence_score = max(0.0, 1.0 - (total_errors / max(len(request.text.split()), 1)))
+            tasks = [check(requests[i]) for i in checked_indices]
             
-            processing_time = time.time() - start_time
-            CORRECTION_DURATION.observe(processing_time)
+            # One text over SpaCy's limit would get the whole batch rejected
+            spacy_indices = [
+                i for i in checked_indices
+                if requests[i].enable_spacy and len(requests[i].text) <= SPACY_MAX_TEXT_LENGTH
+            ]
+            if spacy_indices:
+                tasks.append(self._call_spacy_batch([requests[i].text for i in spacy_indices]))
             
-            return CorrectionResponse(
-                original_text=request.text,
-                corrected_text=corrected_text,
-                languagetool_errors=lt_errors,
-                spacy_suggestions=spacy_suggestions,
-                processing_time=processing_time,
-                timestamp=datetime.now(),
-                language=request.language,
-                confidence_score=confidence_score
-            )
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            
+            # A failed call degrades to an empty result instead of failing the whole batch
+            languagetool_results = [{"matches": []} for _ in requests]
+            for i, result in zip(checked_indices, results[:len(checked_indices)]):
+                languagetool_results[i] = self._result_or_default(result, {"matches": []}, "languagetool")
+            spacy_results = [{"suggestions": []} for _ in requests]
+            if spacy_indices:
+                batch_result = self._result_or_default(results[-1], [], "spacy")
+                for i, spacy_result in zip(spacy_indices, batch_result):
+                    spacy_results[i] = spacy_result
+            
+            return [
+                self._build_response(req, languagetool_result, spacy_result, start_time)
+                for req, languagetool_result, spacy_result in zip(requests, languagetool_results, spacy_results)
+            ]
             
         except Exception as e:
-            logger.error("Error in correction orchestration", error=str(e))
-            raise HTTPException(status_code=500, detail=f"Correction failed: {str(e)}")
+            logger.error("Error in batch correction orchestration", error=str(e))
+            raise HTTPException(status_code=500, detail=f"Batch correction failed: {str(e)}")
+    
+    @staticmethod
+    def _result_or_default(result: Any, default: Any, service: str) -> Any:
+        """Unwrap a gathered upstream result, replacing a raised exception with the default"""
+        if isinstance(result, BaseException):
+            logger.error("Upstream call raised", service=service, error=str(result))
+            return default
+        return result
+    
+    def _build_response(self, request: CorrectionRequest, languagetool_result: Dict[str, Any],
+                        spacy_result: Dict[str, Any], start_time: float) -> CorrectionResponse:
+        """Build the correction response from the upstream results"""
+        # Process LanguageTool errors
+        lt_errors = []
+        for match in languagetool_result.get('matches', []):
+            lt_errors.append(LanguageToolError(
+                offset=match.get('offset', 0),
+                length=match.get('length', 0),
+                rule_id=match.get('rule', {}).get('id', ''),
+                message=match.get('message', ''),
+                shortMessage=match.get('shortMessage', ''),
+                suggestions=[rep['value'] for rep in match.get('replacements', [])[:3]],
+                category=match.get('rule', {}).get('category', {}).get('name', ''),
+                confidence=LANGUAGETOOL_CONFIDENCE
+            ))
+        
+        # Process SpaCy suggestions
+        spacy_suggestions = []
+        for suggestion in spacy_result.get('suggestions', []):
+            spacy_suggestions.append(SpaCySuggestion(
+                original=suggestion.get('original', ''),
+                suggestion=suggestion.get('suggestion', ''),
+                confidence=suggestion.get('confidence', 0.0),
+                reason=suggestion.get('reason', ''),
+                start=suggestion.get('start', 0),
+                end=suggestion.get('end', 0)
+            ))
+        
+        # Apply corrections
+        corrected_text = self._apply_corrections(request.text, languagetool_result.get('matches', []))
+        
+        # Calculate overall confidence score
+        total_errors = len(lt_errors)
+        confidence_score = max(0.0, 1.0 - (total_errors / max(len(request.text.split()), 1)))
+        
+        processing_time = time.time() - start_time
+        CORRECTION_DURATION.observe(processing_time)
+        
+        # Every field is built here from validated parts, so skip re-validation
+        return CorrectionResponse.model_construct(
+            original_text=request.text,
+            corrected_text=corrected_text,
+            languagetool_errors=lt_errors,
+            spacy_suggestions=spacy_suggestions,
+            processing_time=processing_time,
+            timestamp=now_cached(),
+            language=request.language,
+            confidence_score=confidence_score
+        )
     
     async def check_dependencies(self) -> Dict[str, str]:
         """Check health of dependent services"""
         dependencies = {}
+        timeout = aiohttp.ClientTimeout(total=5)
         
         # Check LanguageTool
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(f"{self.languagetool_url}/v2/check?text=test")
-                dependencies["languagetool"] = "healthy" if response.status_code == 200 else "unhealthy"
+            async with self._session.get(
+                f"{self.languagetool_url}/v2/check", params={"text": "test"}, timeout=timeout
+            ) as response:
+                dependencies["languagetool"] = "healthy" if response.status == 200 else "unhealthy"
         except:
             dependencies["languagetool"] = "unreachable"
         
         # Check SpaCy
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(f"{self.spacy_url}/health")
-                dependencies["spacy"] = "healthy" if response.status_code == 200 else "unhealthy"
+            async with self._session.get(f"{self.spacy_url}/health", timeout=timeout) as response:
+                dependencies["spacy"] = "healthy" if response.status == 200 else "unhealthy"
         except:
             dependencies["spacy"] = "unreachable"
         
@@ -292,7 +473,8 @@ app = FastAPI(
     description="Orchestration service for text correction using LanguageTool and SpaCy",
     version="2.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -304,11 +486,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Add rate limiting middleware
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-app.add_middleware(SlowAPIMiddleware)
-
 # Initialize orchestrator
 orchestrator = CorrectionOrchestrator()
 
@@ -316,46 +493,81 @@ orchestrator = CorrectionOrchestrator()
 @app.on_event("startup")
 async def startup_event():
     """Initialize services on startup"""
-    global redis_client
+    global redis_client, rate_limiter
+    
+    await orchestrator.start()
     
     try:
         # Try to connect to Redis for caching
         redis_host = os.getenv('REDIS_HOST', 'redis')
         redis_port = int(os.getenv('REDIS_PORT', 6379))
-        redis_client = redis.Redis(host=redis_host, port=redis_port, decode_responses=True)
-        redis_client.ping()
+        # Blocking pool: past 64 connections a call waits for a free one instead of
+        # raising "Too many connections"
+        redis_client = aioredis.Redis(
+            connection_pool=aioredis.BlockingConnectionPool(
+                host=redis_host, port=redis_port, max_connections=64, timeout=2
+            )
+        )
+        await redis_client.ping()
+        rate_limiter = TokenBucketLimiter(redis_client, RATE_LIMIT_REQUESTS, RATE_LIMIT_WINDOW)
         logger.info("Redis connection established")
     except:
-        logger.warning("Redis not available, caching disabled")
+        logger.warning("Redis not available, caching and rate limiting disabled")
         redis_client = None
+        rate_limiter = None
     
     logger.info("API Gateway started successfully")
 
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    """Log all requests and measure duration"""
-    start_time = time.time()
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release pooled connections on shutdown"""
+    await orchestrator.close()
     
-    response = await call_next(request)
-    
-    duration = time.time() - start_time
-    REQUEST_DURATION.observe(duration)
-    REQUEST_COUNT.labels(
-        method=request.method, 
-        endpoint=request.url.path, 
-        status=response.status_code
-    ).inc()
+    if redis_client:
+        await redis_client.aclose()
+
+class RequestTimingMiddleware:
+    """Pure ASGI middleware that logs all requests and measures duration"""
     
-    logger.info(
-        "Request processed",
-        method=request.method,
-        path=request.url.path,
-        status_code=response.status_code,
-        duration=duration,
-        client_ip=get_remote_address(request)
-    )
+    def __init__(self, app):
+        self.app = app
     
-    return response
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        start_time = time.perf_counter()
+        status_code = 500
+        
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start_time
+            REQUEST_DURATION.observe(duration)
+            REQUEST_COUNT.labels(
+                method=scope["method"],
+                endpoint=scope["path"],
+                status=status_code
+            ).inc()
+            
+            client = scope.get("client")
+            logger.info(
+                "Request processed",
+                method=scope["method"],
+                path=scope["path"],
+                status_code=status_code,
+                duration=duration,
+                client_ip=client[0] if client else "127.0.0.1"
+            )
+
+app.add_middleware(RequestTimingMiddleware)
 
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
@@ -373,34 +585,113 @@ async def health_check():
         version="2.0.0",
         dependencies=dependencies,
         uptime=time.time() - orchestrator.start_time,
-        timestamp=datetime.now()
+        timestamp=now_cached()
     )
 
+# Rendered metrics are reused briefly so bursty scrapes don't re-serialize the registry
+METRICS_SNAPSHOT_TTL = 0.5
+_metrics_snapshot = (float('-inf'), b"")
+
 @app.get("/metrics")
 async def metrics():
     """Prometheus metrics endpoint"""
-    return generate_latest()
+    global _metrics_snapshot
+    now = time.monotonic()
+    if now - _metrics_snapshot[0] >= METRICS_SNAPSHOT_TTL:
+        _metrics_snapshot = (now, generate_latest())
+    # Passed as a header: media_type would get a second charset appended
+    return Response(content=_metrics_snapshot[1], headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+async def enforce_rate_limit(request: Request, cost: int = 1):
+    """Reject the request when the client's token bucket is empty"""
+    if rate_limiter is None:
+        return
+    
+    # A bucket never holds more than RATE_LIMIT_REQUESTS tokens, so waiting won't help
+    if cost > RATE_LIMIT_REQUESTS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Request costs {cost} tokens but the rate limit allows at most "
+                   f"{RATE_LIMIT_REQUESTS} per {RATE_LIMIT_WINDOW:g}s"
+        )
+    
+    try:
+        allowed = await rate_limiter.consume(get_remote_address(request), cost)
+    except Exception as e:
+        # Fail open: a Redis hiccup should not take the API down
+        logger.warning("Rate limiter unavailable", error=str(e))
+        return
+    
+    if not allowed:
+        RATE_LIMIT_HITS.inc()
+        raise HTTPException(status_code=429, detail="Rate limit exceeded")
+
+async def rate_limit(request: Request):
+    """Dependency applying the per-client rate limit"""
+    await enforce_rate_limit(request)
+
+# Corrections currently being computed in this worker, keyed like the cache
+_inflight: Dict[str, asyncio.Task] = {}
+
+def _cache_key(correction_request: CorrectionRequest) -> str:
+    """Build a cache key that is stable across workers and restarts"""
+    # Hash the exact text: cached responses carry offsets into it
+    digest = hashlib.blake2b(correction_request.text.encode("utf-8"), digest_size=16).hexdigest()
+    return (
+        f"correction:{digest}:{correction_request.language}:{int(correction_request.enable_spacy)}"
+    )
+
+async def _correct_and_cache(correction_request: CorrectionRequest, cache_key: str) -> CorrectionResponse:
+    """Run a correction and cache its result, detached from the requests awaiting it"""
+    try:
+        result = await orchestrator.correct_text(correction_request)
+        
+        # Cache result (if Redis is available)
+        if redis_client:
+            try:
+                await redis_client.set(cache_key, orjson.dumps(result.model_dump()), ex=3600)  # Cache for 1 hour
+            except Exception as e:
+                logger.warning("Cache unavailable", error=str(e))
+        
+        return result
+    finally:
+        _inflight.pop(cache_key, None)
 
-@app.post("/correct", response_model=CorrectionResponse)
-# @limiter.limit("100/minute")  # Rate limit - temporarily disabled
+def _retrieve_exception(task: asyncio.Task):
+    """Mark a failure as retrieved in case every request awaiting the task went away"""
+    if not task.cancelled():
+        task.exception()
+
+@app.post("/correct", response_model=CorrectionResponse, dependencies=[Depends(rate_limit)])
 async def correct_text(correction_request: CorrectionRequest, request: Request = None):
     """Main text correction endpoint"""
     try:
         # Check cache first (if Redis is available)
-        cache_key = None
+        cache_key = _cache_key(correction_request)
         if redis_client:
-            cache_key = f"correction:{hash(correction_request.text)}:{correction_request.language}:{correction_request.threshold}"
-            cached_result = redis_client.get(cache_key)
+            try:
+                cached_result = await redis_client.get(cache_key)
+            except Exception as e:
+                # Like the rate limiter, fail open: an unreachable cache is a miss
+                logger.warning("Cache unavailable", error=str(e))
+                cached_result = None
             if cached_result:
                 logger.info("Cache hit for correction request")
-                return CorrectionResponse.parse_raw(cached_result)
+                return CorrectionResponse.model_validate_json(cached_result)
         
-        # Perform correction
-        result = await orchestrator.correct_text(correction_request)
+        # Share the result of an identical correction that is already running
+        inflight = _inflight.get(cache_key)
+        if inflight is not None:
+            logger.info("Joined in-flight correction request")
+            return await asyncio.shield(inflight)
         
-        # Cache result (if Redis is available)
-        if redis_client and cache_key:
-            redis_client.setex(cache_key, 3600, result.json())  # Cache for 1 hour
+        # No await between the lookup above and this insert, so it can't race.
+        # The task outlives this request, so a client disconnecting doesn't
+        # cancel the correction for the requests that joined it
+        inflight = asyncio.create_task(_correct_and_cache(correction_request, cache_key))
+        inflight.add_done_callback(_retrieve_exception)
+        _inflight[cache_key] = inflight
+        result = await asyncio.shield(inflight)
         
         logger.info(
             "Text corrected successfully",
@@ -419,9 +710,63 @@ async def correct_text(correction_request: CorrectionRequest, request: Request =
         logger.error("Unexpected error in correct endpoint", error=str(e))
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@app.post("/correct/batch", response_model=List[CorrectionResponse])
+async def correct_text_batch(batch_request: BatchCorrectionRequest, request: Request = None):
+    """Batch text correction endpoint"""
+    # Each text in the batch costs one token
+    await enforce_rate_limit(request, cost=len(batch_request.texts))
+    
+    try:
+        correction_requests = batch_request.to_requests()
+        results: List[Optional[CorrectionResponse]] = [None] * len(correction_requests)
+        
+        # Check cache first (if Redis is available)
+        cache_keys = []
+        if redis_client:
+            cache_keys = [_cache_key(req) for req in correction_requests]
+            try:
+                cached_results = await redis_client.mget(cache_keys)
+            except Exception as e:
+                # Like the rate limiter, fail open: an unreachable cache is a miss
+                logger.warning("Cache unavailable", error=str(e))
+                cached_results = []
+            for i, cached_result in enumerate(cached_results):
+                if cached_result:
+                    results[i] = CorrectionResponse.model_validate_json(cached_result)
+        
+        # Correct the remaining texts in one orchestrated batch
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            corrected = await orchestrator.correct_batch([correction_requests[i] for i in missing])
+            for i, result in zip(missing, corrected):
+                results[i] = result
+            
+            # Cache results (if Redis is available)
+            if redis_client and cache_keys:
+                try:
+                    async with redis_client.pipeline(transaction=False) as pipe:
+                        for i in missing:
+                            pipe.set(cache_keys[i], orjson.dumps(results[i].model_dump()), ex=3600)  # Cache for 1 hour
+                        await pipe.execute()
+                except Exception as e:
+                    logger.warning("Cache unavailable", error=str(e))
+        
+        logger.info(
+            "Batch corrected successfully",
+            batch_size=len(correction_requests),
+            cache_hits=len(correction_requests) - len(missing)
+        )
+        
+        return results
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Unexpected error in batch correct endpoint", error=str(e))
+        raise HTTPException(status_code=500, detail="Internal server error")
+
 # Backward compatibility endpoint
-@app.post("/corrigir", response_model=CorrectionResponse)
-# @limiter.limit("100/minute")  # Rate limit - temporarily disabled
+@app.post("/corrigir", response_model=CorrectionResponse, dependencies=[Depends(rate_limit)])
 async def corrigir_texto(request_data: dict, request: Request = None):
     """Legacy endpoint for backward compatibility"""
     try:
@@ -447,6 +792,7 @@ async def root():
         "description": "Advanced text correction using LanguageTool and SpaCy",
         "endpoints": {
             "correct": "/correct",
+            "correct_batch": "/correct/batch",
             "corrigir": "/corrigir (legacy)",
             "health": "/health",
             "metrics": "/metrics",
@@ -473,6 +819,8 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=port,
         workers=workers,
+        # Take the client address from X-Forwarded-For when the peer is the proxy
+        forwarded_allow_ips=os.getenv('FORWARDED_ALLOW_IPS', '127.0.0.1'),
         log_level="info",
         access_log=True
     )
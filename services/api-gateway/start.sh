@@ -15,44 +15,41 @@ echo "   Workers: ${GATEWAY_WORKERS}"
 echo "   LanguageTool URL: ${LANGUAGETOOL_URL}"
 echo "   SpaCy URL: ${SPACY_URL}"
 
+# Poll a dependency with exponential backoff (0.1s doubling up to 2s, ±20% jitter)
+# until it answers or the time budget runs out
+wait_for_dependency() {
+    local name=$1
+    local url=$2
+    local timeout=$3
+    local start=$SECONDS
+    local delay_ms=100
+    local attempt=0
+    
+    echo "🔍 Checking ${name} availability..."
+    while [ $((SECONDS - start)) -lt $timeout ]; do
+        if curl -s -f --max-time 5 "${url}" > /dev/null; then
+            echo "✅ ${name} is ready"
+            return 0
+        fi
+        # Report progress every few attempts rather than on every probe
+        attempt=$((attempt + 1))
+        if [ $((attempt % 5)) -eq 0 ]; then
+            echo "⏳ ${name} not ready, waiting... ($((SECONDS - start))/$timeout)"
+        fi
+        local sleep_ms=$((delay_ms * (80 + RANDOM % 41) / 100))
+        sleep "$((sleep_ms / 1000)).$(printf '%03d' $((sleep_ms % 1000)))"
+        delay_ms=$((delay_ms * 2 > 2000 ? 2000 : delay_ms * 2))
+    done
+    
+    echo "⚠️  ${name} not ready after ${timeout}s, starting anyway..."
+    return 1
+}
+
 # Wait for dependencies to be ready
 echo "⏳ Waiting for dependencies..."
-
-# Wait for LanguageTool
-echo "🔍 Checking LanguageTool availability..."
-timeout=60
-counter=0
-while [ $counter -lt $timeout ]; do
-    if curl -s -f "${LANGUAGETOOL_URL}/v2/check?text=test" > /dev/null; then
-        echo "✅ LanguageTool is ready"
-        break
-    fi
-    echo "⏳ LanguageTool not ready, waiting... ($counter/$timeout)"
-    sleep 2
-    counter=$((counter + 2))
-done
-
-if [ $counter -ge $timeout ]; then
-    echo "⚠️  LanguageTool not ready after ${timeout}s, starting anyway..."
-fi
-
-# Wait for SpaCy (optional)
-echo "🔍 Checking SpaCy availability..."
-timeout=30
-counter=0
-while [ $counter -lt $timeout ]; do
-    if curl -s -f "${SPACY_URL}/health" > /dev/null; then
-        echo "✅ SpaCy is ready"
-        break
-    fi
-    echo "⏳ SpaCy not ready, waiting... ($counter/$timeout)"
-    sleep 2
-    counter=$((counter + 2))
-done
-
-if [ $counter -ge $timeout ]; then
-    echo "⚠️  SpaCy not ready after ${timeout}s, starting anyway..."
-fi
+wait_for_dependency "LanguageTool" "${LANGUAGETOOL_URL}/v2/check?text=test" 60
+# SpaCy is optional
+wait_for_dependency "SpaCy" "${SPACY_URL}/health" 30
 
 # Start the gateway
 echo "🚀 Starting API Gateway on port ${GATEWAY_PORT}..."
@@ -60,5 +57,6 @@ exec uvicorn main:app \
     --host 0.0.0.0 \
     --port ${GATEWAY_PORT} \
     --workers ${GATEWAY_WORKERS} \
+    --forwarded-allow-ips "${FORWARDED_ALLOW_IPS:-127.0.0.1}" \
     --log-level info \
     --access-log
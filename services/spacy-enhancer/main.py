@@ -5,15 +5,20 @@ Provides semantic analysis and contextual suggestions for text correction
 """
 
 import os
+import asyncio
+import hashlib
 import logging
+import re
 import time
-from typing import List, Dict, Optional, Any
+from collections import OrderedDict
+from typing import Annotated, List, Dict, Optional, Any
 from datetime import datetime
 
 import spacy
 import structlog
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
 from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
 from tenacity import retry, stop_after_attempt, wait_exponential
@@ -40,10 +45,52 @@ structlog.configure(
 logger = structlog.get_logger()
 
 # Prometheus metrics
+# Latency buckets concentrated on the tens-to-hundreds of milliseconds these services take,
+# the same buckets the gateway uses
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.2, 0.4, 0.8, 1.6, 3.2, 6.4, 12.8)
 REQUEST_COUNT = Counter('spacy_requests_total', 'Total requests to SpaCy service', ['method', 'endpoint'])
-REQUEST_DURATION = Histogram('spacy_request_duration_seconds', 'Request duration in seconds')
-PROCESSING_DURATION = Histogram('spacy_processing_duration_seconds', 'Text processing duration in seconds')
+REQUEST_DURATION = Histogram('spacy_request_duration_seconds', 'Request duration in seconds', buckets=LATENCY_BUCKETS)
+PROCESSING_DURATION = Histogram('spacy_processing_duration_seconds', 'Text processing duration in seconds', buckets=LATENCY_BUCKETS)
 ERROR_COUNT = Counter('spacy_errors_total', 'Total errors in SpaCy service', ['error_type'])
+CACHE_HITS = Counter('spacy_cache_hits_total', 'Analyses served from the in-process cache')
+
+# Formal alternatives for common informal words
+INFORMAL_FORMAL = {
+    'tá': 'está',
+    'né': 'não é',
+    'pra': 'para',
+    'pro': 'para o',
+    'numa': 'em uma',
+    'dele': 'de ele',
+    'dela': 'de ela'
+}
+
+# Finds the informal words in raw text, as whole words in any letter case
+INFORMAL_PATTERN = re.compile(
+    r"(?<![^\W\d_])(?:%s)(?![^\W\d_])"
+    % "|".join(re.escape(word) for word in sorted(INFORMAL_FORMAL, key=len, reverse=True)),
+    re.IGNORECASE
+)
+
+# Pipeline components that can be skipped when a request does not need their output
+OPTIONAL_COMPONENTS = ("tok2vec", "tagger", "morphologizer", "attribute_ruler", "lemmatizer", "parser", "ner")
+TAGGING_COMPONENTS = ("tagger", "morphologizer", "attribute_ruler", "lemmatizer")
+
+# Number of serialized analyses kept in memory per worker
+ANALYSIS_CACHE_SIZE = int(os.getenv('ANALYSIS_CACHE_SIZE', 2048))
+
+# Most /analyze requests parsed together in one pipeline run
+ANALYSIS_BATCH_SIZE = 32
+
+# Timestamps are refreshed at most every half second and shared between responses
+_now_cache = [0.0, None]
+
+def now_cached() -> datetime:
+    """Return the current time, at most 0.5s stale"""
+    t = time.time()
+    if t - _now_cache[0] > 0.5:
+        _now_cache[:] = [t, datetime.fromtimestamp(t)]
+    return _now_cache[1]
 
 # Pydantic models
 class TextRequest(BaseModel):
@@ -52,6 +99,17 @@ class TextRequest(BaseModel):
     include_pos: bool = Field(default=True, description="Include part-of-speech tagging")
     include_dependencies: bool = Field(default=False, description="Include dependency parsing")
     include_suggestions: bool = Field(default=True, description="Include contextual suggestions")
+    include_conjugation_check: bool = Field(default=False, description="Include verb conjugation suggestions")
+
+class BatchTextRequest(BaseModel):
+    texts: List[Annotated[str, Field(min_length=1, max_length=10000)]] = Field(
+        ..., min_length=1, max_length=100, description="Texts to analyze"
+    )
+    include_entities: bool = Field(default=True, description="Include named entity recognition")
+    include_pos: bool = Field(default=True, description="Include part-of-speech tagging")
+    include_dependencies: bool = Field(default=False, description="Include dependency parsing")
+    include_suggestions: bool = Field(default=True, description="Include contextual suggestions")
+    include_conjugation_check: bool = Field(default=False, description="Include verb conjugation suggestions")
 
 class Entity(BaseModel):
     text: str
@@ -93,6 +151,88 @@ class HealthResponse(BaseModel):
     uptime: float
     timestamp: datetime
 
+class AnalysisCache:
+    """LRU cache of serialized analyses; the SpaCy pipeline is deterministic"""
+    
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: OrderedDict = OrderedDict()
+    
+    @staticmethod
+    def key(request: TextRequest) -> tuple:
+        digest = hashlib.blake2b(request.text.encode("utf-8"), digest_size=16).digest()
+        return (
+            digest, request.include_entities, request.include_pos, request.include_dependencies,
+            request.include_suggestions, request.include_conjugation_check
+        )
+    
+    def get(self, key: tuple) -> Optional[bytes]:
+        body = self._entries.get(key)
+        if body is not None:
+            self._entries.move_to_end(key)
+        return body
+    
+    def put(self, key: tuple, body: bytes):
+        self._entries[key] = body
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+class AnalysisBatcher:
+    """Parses concurrent /analyze requests together in batched pipeline runs"""
+    
+    def __init__(self, service, max_batch_size: int):
+        self.service = service
+        self.max_batch_size = max_batch_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        """Start the consumer on the running event loop"""
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._consume())
+    
+    async def stop(self):
+        """Stop the consumer"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+    
+    async def analyze(self, request: TextRequest) -> AnalysisResponse:
+        """Queue a request for the next batch and wait for its result"""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((request, future))
+        return await future
+    
+    async def _consume(self):
+        while True:
+            # Whatever queued up while the previous batch was parsing forms the next one
+            items = [await self._queue.get()]
+            while len(items) < self.max_batch_size and not self._queue.empty():
+                items.append(self._queue.get_nowait())
+            
+            # Skip requests whose clients have already gone away
+            items = [(request, future) for request, future in items if not future.done()]
+            if not items:
+                continue
+            
+            try:
+                results = await asyncio.to_thread(
+                    self.service.analyze_requests, [request for request, _ in items]
+                )
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            for (_, future), result in zip(items, results):
+                if not future.done():
+                    future.set_result(result)
+
 # SpaCy service class
 class SpaCyService:
     def __init__(self):
@@ -123,85 +263,169 @@ class SpaCyService:
         start_time = time.time()
         
         try:
-            # Process text with SpaCy
-            doc = self.nlp(request.text)
+            if self.needs_doc(request):
+                # Process text with SpaCy, skipping components the request does not need
+                doc = self.nlp(request.text, disable=self._disabled_components(request))
+            else:
+                # Informal words are matched on the raw text, no Doc needed
+                doc = None
             
-            # Extract entities
-            entities = []
-            if request.include_entities:
-                for ent in doc.ents:
-                    entities.append(Entity(
-                        text=ent.text,
-                        label=ent.label_,
-                        start=ent.start_char,
-                        end=ent.end_char,
-                        confidence=ent._.get('confidence', 0.0) if hasattr(ent._, 'confidence') else 0.0
-                    ))
+            processing_time = time.time() - start_time
+            PROCESSING_DURATION.observe(processing_time)
             
-            # Extract tokens
-            tokens = []
-            if request.include_pos:
-                for token in doc:
-                    tokens.append(Token(
-                        text=token.text,
-                        pos=token.pos_,
-                        tag=token.tag_,
-                        lemma=token.lemma_,
-                        is_alpha=token.is_alpha,
-                        is_stop=token.is_stop
-                    ))
+            return self._build_response(request.text, doc, request, processing_time)
             
-            # Generate contextual suggestions
-            suggestions = []
-            if request.include_suggestions:
-                suggestions = self._generate_suggestions(doc)
+        except Exception as e:
+            ERROR_COUNT.labels(error_type=type(e).__name__).inc()
+            logger.error("Error analyzing text", error=str(e), text_length=len(request.text))
+            raise HTTPException(status_code=500, detail=f"Error analyzing text: {str(e)}")
+    
+    def analyze_batch(self, request: BatchTextRequest) -> List[AnalysisResponse]:
+        """Analyze several texts in one pass through the SpaCy pipeline"""
+        start_time = time.time()
+        
+        try:
+            if self.needs_doc(request):
+                docs = list(self.nlp.pipe(
+                    request.texts, batch_size=32, disable=self._disabled_components(request)
+                ))
+            else:
+                docs = [None] * len(request.texts)
             
             processing_time = time.time() - start_time
             PROCESSING_DURATION.observe(processing_time)
             
-            return AnalysisResponse(
-                text=request.text,
-                language=doc.lang_,
-                entities=entities,
-                tokens=tokens,
-                suggestions=suggestions,
-                processing_time=processing_time,
-                timestamp=datetime.now()
-            )
+            return [
+                self._build_response(text, doc, request, processing_time)
+                for text, doc in zip(request.texts, docs)
+            ]
             
         except Exception as e:
             ERROR_COUNT.labels(error_type=type(e).__name__).inc()
-            logger.error("Error analyzing text", error=str(e), text_length=len(request.text))
+            logger.error("Error analyzing batch", error=str(e), batch_size=len(request.texts))
+            raise HTTPException(status_code=500, detail=f"Error analyzing batch: {str(e)}")
+    
+    def analyze_requests(self, requests: List[TextRequest]) -> List[AnalysisResponse]:
+        """Analyze independent requests together, one pipeline run per set of needed components"""
+        start_time = time.time()
+        
+        try:
+            # Requests that skip the same components can share a pipeline run
+            groups: Dict[tuple, List[int]] = {}
+            for i, request in enumerate(requests):
+                if self.needs_doc(request):
+                    groups.setdefault(tuple(self._disabled_components(request)), []).append(i)
+            
+            docs = [None] * len(requests)
+            for disabled, indices in groups.items():
+                texts = [requests[i].text for i in indices]
+                for i, doc in zip(indices, self.nlp.pipe(texts, batch_size=32, disable=list(disabled))):
+                    docs[i] = doc
+            
+            processing_time = time.time() - start_time
+            PROCESSING_DURATION.observe(processing_time)
+            
+            return [
+                self._build_response(request.text, doc, request, processing_time)
+                for request, doc in zip(requests, docs)
+            ]
+            
+        except Exception as e:
+            ERROR_COUNT.labels(error_type=type(e).__name__).inc()
+            logger.error("Error analyzing queued requests", error=str(e), batch_size=len(requests))
             raise HTTPException(status_code=500, detail=f"Error analyzing text: {str(e)}")
     
-    def _generate_suggestions(self, doc) -> List[Suggestion]:
-        """Generate contextual suggestions for text improvement"""
+    def needs_doc(self, request) -> bool:
+        """Whether any requested output comes from the SpaCy pipeline"""
+        return request.include_entities or request.include_pos or (
+            request.include_suggestions and request.include_conjugation_check
+        )
+    
+    def _disabled_components(self, request) -> List[str]:
+        """List pipeline components whose output the request does not use"""
+        needed = set()
+        if request.include_entities:
+            needed.add("ner")
+        if request.include_pos:
+            needed.update(TAGGING_COMPONENTS)
+        if request.include_dependencies:
+            needed.add("parser")
+        if request.include_suggestions and request.include_conjugation_check:
+            # The verb conjugation check reads POS, lemma and syntactic head
+            needed.update(TAGGING_COMPONENTS)
+            needed.add("parser")
+        if needed:
+            # Trained components may listen to the shared tok2vec layer
+            needed.add("tok2vec")
+        
+        return [
+            name for name in self.nlp.pipe_names
+            if name in OPTIONAL_COMPONENTS and name not in needed
+        ]
+    
+    def _build_response(self, text: str, doc, request, processing_time: float) -> AnalysisResponse:
+        """Build the analysis response for a text and its document, if one was needed"""
+        # Extract entities
+        entities = []
+        if request.include_entities:
+            for ent in doc.ents:
+                entities.append(Entity(
+                    text=ent.text,
+                    label=ent.label_,
+                    start=ent.start_char,
+                    end=ent.end_char,
+                    confidence=ent._.get('confidence', 0.0) if hasattr(ent._, 'confidence') else 0.0
+                ))
+        
+        # Extract tokens
+        tokens = []
+        if request.include_pos:
+            for token in doc:
+                tokens.append(Token(
+                    text=token.text,
+                    pos=token.pos_,
+                    tag=token.tag_,
+                    lemma=token.lemma_,
+                    is_alpha=token.is_alpha,
+                    is_stop=token.is_stop
+                ))
+        
+        # Generate contextual suggestions
         suggestions = []
+        if request.include_suggestions:
+            suggestions = self._generate_suggestions(text, doc if request.include_conjugation_check else None)
+        
+        # Every field is built here from validated parts, so skip re-validation
+        return AnalysisResponse.model_construct(
+            text=text,
+            language=self.nlp.lang,
+            entities=entities,
+            tokens=tokens,
+            suggestions=suggestions,
+            processing_time=processing_time,
+            timestamp=now_cached()
+        )
+    
+    def _generate_suggestions(self, text: str, doc=None) -> List[Suggestion]:
+        """Generate contextual suggestions; the conjugation check runs only when a doc is given"""
+        # Suggest formal alternatives for informal words
+        suggestions = [
+            Suggestion(
+                original=match.group(),
+                suggestion=INFORMAL_FORMAL[match.group().lower()],
+                confidence=0.8,
+                reason="Sugestão de linguagem formal",
+                start=match.start(),
+                end=match.end()
+            )
+            for match in INFORMAL_PATTERN.finditer(text)
+        ]
+        
+        if doc is None:
+            return suggestions
         
         # Common grammar patterns to suggest improvements
         for token in doc:
-            # Suggest formal alternatives for informal words
-            informal_formal = {
-                'tá': 'está',
-                'né': 'não é',
-                'pra': 'para',
-                'pro': 'para o',
-                'numa': 'em uma',
-                'numa': 'em uma',
-                'dele': 'de ele',
-                'dela': 'de ela'
-            }
-            
-            if token.text.lower() in informal_formal:
-                suggestions.append(Suggestion(
-                    original=token.text,
-                    suggestion=informal_formal[token.text.lower()],
-                    confidence=0.8,
-                    reason="Sugestão de linguagem formal",
-                    start=token.idx,
-                    end=token.idx + len(token.text)
-                ))
-            
             # Detect potential verb conjugation issues
             if token.pos_ == 'VERB' and token.tag_.startswith('V'):
                 # This is a simplified example - in production, you'd use more sophisticated rules
@@ -217,6 +441,8 @@ class SpaCyService:
                             end=token.idx + len(token.text)
                         ))
         
+        # Keep suggestions in text order
+        suggestions.sort(key=lambda suggestion: suggestion.start)
         return suggestions
 
 # Initialize FastAPI app
@@ -225,7 +451,8 @@ app = FastAPI(
     description="Semantic analysis and contextual suggestions for Portuguese text",
     version="2.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -240,36 +467,67 @@ app.add_middleware(
 # Initialize SpaCy service
 spacy_service = SpaCyService()
 
+# Load the model at import time: with gunicorn --preload this happens once in the
+# master, and the forked workers share the model's memory pages copy-on-write
+try:
+    spacy_service.load_model()
+    # Warm up the pipeline so the first request doesn't pay for lazy initialization
+    spacy_service.nlp("Aquecimento do modelo.")
+except Exception as e:
+    logger.error("Failed to start SpaCy service", error=str(e))
+    raise
+
+# Only touched from the event loop, so it needs no locking
+analysis_cache = AnalysisCache(ANALYSIS_CACHE_SIZE)
+analysis_batcher = AnalysisBatcher(spacy_service, ANALYSIS_BATCH_SIZE)
+
 @app.on_event("startup")
 async def startup_event():
-    """Initialize the SpaCy model on startup"""
-    try:
-        spacy_service.load_model()
-        logger.info("SpaCy Enhancer Service started successfully")
-    except Exception as e:
-        logger.error("Failed to start SpaCy service", error=str(e))
-        raise
+    """Start the request batcher; the model is already loaded at import"""
+    analysis_batcher.start()
+    logger.info("SpaCy Enhancer Service started successfully", model=spacy_service.model_name, pid=os.getpid())
 
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    """Log all requests and measure duration"""
-    start_time = time.time()
-    
-    response = await call_next(request)
-    
-    duration = time.time() - start_time
-    REQUEST_DURATION.observe(duration)
-    REQUEST_COUNT.labels(method=request.method, endpoint=request.url.path).inc()
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the request batcher on shutdown"""
+    await analysis_batcher.stop()
+
+class RequestTimingMiddleware:
+    """Pure ASGI middleware that logs all requests and measures duration"""
     
-    logger.info(
-        "Request processed",
-        method=request.method,
-        path=request.url.path,
-        status_code=response.status_code,
-        duration=duration
-    )
+    def __init__(self, app):
+        self.app = app
     
-    return response
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        start_time = time.perf_counter()
+        status_code = 500
+        
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start_time
+            REQUEST_DURATION.observe(duration)
+            REQUEST_COUNT.labels(method=scope["method"], endpoint=scope["path"]).inc()
+            
+            logger.info(
+                "Request processed",
+                method=scope["method"],
+                path=scope["path"],
+                status_code=status_code,
+                duration=duration
+            )
+
+app.add_middleware(RequestTimingMiddleware)
 
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
@@ -280,13 +538,22 @@ async def health_check():
         version="2.0.0",
         spacy_model=spacy_service.model_name,
         uptime=time.time() - spacy_service.start_time,
-        timestamp=datetime.now()
+        timestamp=now_cached()
     )
 
+# Rendered metrics are reused briefly so bursty scrapes don't re-serialize the registry
+METRICS_SNAPSHOT_TTL = 0.5
+_metrics_snapshot = (float('-inf'), b"")
+
 @app.get("/metrics")
 async def metrics():
     """Prometheus metrics endpoint"""
-    return generate_latest()
+    global _metrics_snapshot
+    now = time.monotonic()
+    if now - _metrics_snapshot[0] >= METRICS_SNAPSHOT_TTL:
+        _metrics_snapshot = (now, generate_latest())
+    # Passed as a header: media_type would get a second charset appended
+    return Response(content=_metrics_snapshot[1], headers={"Content-Type": CONTENT_TYPE_LATEST})
 
 @app.post("/analyze", response_model=AnalysisResponse)
 async def analyze_text(request: TextRequest):
@@ -295,7 +562,18 @@ async def analyze_text(request: TextRequest):
         if not spacy_service.nlp:
             raise HTTPException(status_code=503, detail="SpaCy model not loaded")
         
-        result = spacy_service.analyze_text(request)
+        cache_key = analysis_cache.key(request)
+        cached_body = analysis_cache.get(cache_key)
+        if cached_body is not None:
+            CACHE_HITS.inc()
+            return Response(content=cached_body, media_type="application/json")
+        
+        if spacy_service.needs_doc(request):
+            # Parsed off the event loop, batched with other concurrent requests
+            result = await analysis_batcher.analyze(request)
+        else:
+            # Only the informal-word regex runs, cheap enough for the event loop
+            result = spacy_service.analyze_text(request)
         
         logger.info(
             "Text analyzed successfully",
@@ -305,7 +583,10 @@ async def analyze_text(request: TextRequest):
             processing_time=result.processing_time
         )
         
-        return result
+        # Serialize once, for both the cache and this response
+        body = result.model_dump_json().encode("utf-8")
+        analysis_cache.put(cache_key, body)
+        return Response(content=body, media_type="application/json")
         
     except HTTPException:
         raise
@@ -314,6 +595,30 @@ async def analyze_text(request: TextRequest):
         logger.error("Unexpected error in analyze endpoint", error=str(e))
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@app.post("/analyze/batch", response_model=List[AnalysisResponse])
+async def analyze_batch(request: BatchTextRequest):
+    """Analyze several texts in a single batched pipeline run"""
+    try:
+        if not spacy_service.nlp:
+            raise HTTPException(status_code=503, detail="SpaCy model not loaded")
+        
+        results = await asyncio.to_thread(spacy_service.analyze_batch, request)
+        
+        logger.info(
+            "Batch analyzed successfully",
+            batch_size=len(request.texts),
+            suggestions_made=sum(len(result.suggestions) for result in results)
+        )
+        
+        return results
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        ERROR_COUNT.labels(error_type=type(e).__name__).inc()
+        logger.error("Unexpected error in batch analyze endpoint", error=str(e))
+        raise HTTPException(status_code=500, detail="Internal server error")
+
 @app.get("/")
 async def root():
     """Root endpoint with service information"""
@@ -324,6 +629,7 @@ async def root():
         "endpoints": {
             "health": "/health",
             "analyze": "/analyze",
+            "analyze_batch": "/analyze/batch",
             "metrics": "/metrics",
             "docs": "/docs"
         }
@@ -333,13 +639,15 @@ if __name__ == "__main__":
     import uvicorn
     
     port = int(os.getenv('SPACY_PORT', 8020))
-    workers = int(os.getenv('WORKERS', 2))
     
+    # Serve the app already imported above in a single process: the model is loaded
+    # once, here; multi-worker serving goes through start.sh (gunicorn --preload)
     uvicorn.run(
-        "main:app",
+        app,
         host="0.0.0.0",
         port=port,
-        workers=workers,
+        # Outlive the gateway's 30s pooled keep-alive so it never reuses a closed socket
+        timeout_keep_alive=75,
         log_level="info",
         access_log=True
     )
@@ -33,9 +33,12 @@ fi
 
 # Start the service
 echo "🚀 Starting SpaCy Enhancer on port ${SPACY_PORT}..."
-exec uvicorn main:app \
-    --host 0.0.0.0 \
-    --port ${SPACY_PORT} \
+# --preload loads the model once before forking so workers share its memory
+exec gunicorn main:app \
+    --worker-class uvicorn.workers.UvicornWorker \
+    --preload \
+    --bind 0.0.0.0:${SPACY_PORT} \
     --workers ${WORKERS} \
+    --keep-alive 75 \
     --log-level info \
-    --access-log
+    --access-logfile -